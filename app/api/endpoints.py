@@ -3,20 +3,17 @@ FastAPI endpoints for document upload, chat, and management operations.
 """
 
 import os
-import shutil
+import json
 import logging
+import threading
 from typing import List
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from app.models.schemas import (
-    ChatRequest, ChatResponse, DocumentUploadResponse, 
+    ChatRequest, ChatResponse, DocumentUploadResponse,
     DocumentListResponse, DocumentInfo, ErrorResponse
 )
-from app.services.document_processor import DocumentProcessor
-from app.services.vector_store import VectorStore
-from app.services.chat_service import ChatService
-from app.services.local_chat import LocalChatService
 from app.core.config import settings
 
 # Initialize services lazily
@@ -24,33 +21,52 @@ document_processor = None
 vector_store = None
 chat_service = None
 
+# Guards first-call initialization so concurrent startup requests don't
+# load the embedding model twice
+_services_lock = threading.Lock()
+
 def get_services():
-    """Get or initialize services."""
+    """Get or initialize services.
+
+    The service modules transitively import sentence-transformers, faiss and
+    openai (torch init alone costs seconds and hundreds of MB), so they are
+    imported here on first use instead of at module load. The server binds
+    its port immediately and only the first request pays the model load.
+    """
     global document_processor, vector_store, chat_service
-    
-    if document_processor is None:
-        document_processor = DocumentProcessor()
-    
-    if vector_store is None:
-        vector_store = VectorStore()
-    
-    if chat_service is None:
-        # Try to use Azure OpenAI chat service first, fallback to local chat
-        try:
-            # Check if Azure OpenAI is properly configured
-            if (settings.azure_openai_api_key and 
-                settings.azure_openai_endpoint and 
-                settings.azure_openai_deployment_name ):
-                chat_service = ChatService(vector_store)
-                print("✅ Using Azure OpenAI chat service")
-            else:
+
+    if chat_service is not None:
+        return document_processor, vector_store, chat_service
+
+    with _services_lock:
+        if document_processor is None:
+            from app.services.document_processor import DocumentProcessor
+            document_processor = DocumentProcessor()
+
+        if vector_store is None:
+            from app.services.vector_store import VectorStore
+            vector_store = VectorStore()
+
+        if chat_service is None:
+            from app.services.chat_service import ChatService
+            from app.services.local_chat import LocalChatService
+
+            # Try to use Azure OpenAI chat service first, fallback to local chat
+            try:
+                # Check if Azure OpenAI is properly configured
+                if (settings.azure_openai_api_key and
+                    settings.azure_openai_endpoint and
+                    settings.azure_openai_deployment_name ):
+                    chat_service = ChatService(vector_store)
+                    print("✅ Using Azure OpenAI chat service")
+                else:
+                    chat_service = LocalChatService(vector_store)
+                    print("✅ Using local chat service (no Azure OpenAI configured)")
+            except Exception as e:
+                print(f"⚠️  Failed to initialize Azure OpenAI chat service: {e}")
+                print("🔄 Falling back to local chat service...")
                 chat_service = LocalChatService(vector_store)
-                print("✅ Using local chat service (no Azure OpenAI configured)")
-        except Exception as e:
-            print(f"⚠️  Failed to initialize Azure OpenAI chat service: {e}")
-            print("🔄 Falling back to local chat service...")
-            chat_service = LocalChatService(vector_store)
-    
+
     return document_processor, vector_store, chat_service
 
 # Create router
@@ -59,6 +75,9 @@ router = APIRouter()
 # Setup logger
 logger = logging.getLogger(__name__)
 
+# Upload streaming block size (1MB)
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 
 @router.post("/upload", response_model=DocumentUploadResponse)
 async def upload_document(file: UploadFile = File(...)):
@@ -86,10 +105,14 @@ async def upload_document(file: UploadFile = File(...)):
     
     file_path = None
     try:
-        # Save uploaded file
+        # Save uploaded file, streaming in 1MB blocks. Reading through the
+        # async UploadFile API avoids blocking the event loop on the sync
+        # file wrapper, and the large buffer cuts write syscalls vs the
+        # 16KB default used by shutil.copyfileobj.
         file_path = os.path.join(settings.upload_dir, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        with open(file_path, "wb", buffering=UPLOAD_CHUNK_SIZE) as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                buffer.write(chunk)
         
         # Process document
         result = doc_processor.process_document(file_path, file.filename)
@@ -137,7 +160,7 @@ async def chat(request: ChatRequest):
     _, _, chat_svc = get_services()
     
     try:
-        result = chat_svc.chat(
+        result = await chat_svc.chat(
             question=request.question,
             conversation_id=request.conversation_id
         )
@@ -152,6 +175,29 @@ async def chat(request: ChatRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Chat with streaming output over Server-Sent Events.
+
+    Each answer fragment arrives as a `data: {"delta": ...}` event; the final
+    event carries the sources and conversation_id with `"done": true`. First
+    tokens reach the client in a few hundred milliseconds instead of after
+    the full completion.
+    """
+
+    # Get services
+    _, _, chat_svc = get_services()
+
+    async def event_source():
+        async for event in chat_svc.chat_stream(
+            question=request.question,
+            conversation_id=request.conversation_id
+        ):
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(event_source(), media_type="text/event-stream")
+
+
 @router.get("/documents", response_model=DocumentListResponse)
 async def list_documents():
     """List all uploaded documents."""
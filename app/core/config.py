@@ -4,80 +4,149 @@ Handles environment variables and application settings.
 """
 
 import os
+from dataclasses import dataclass
 from typing import Optional
-from pydantic_settings import BaseSettings
-from pydantic import Field, validator
 
+from dotenv import load_dotenv
+
+
+# Recognized boolean spellings; frozenset membership is a single C-level
+# hash lookup instead of a Python loop over a tuple
+_TRUE = frozenset({'true', '1', 'yes', 'on'})
+_FALSE = frozenset({'false', '0', 'no', 'off', 'warn', 'warning'})
+
+
+def _parse_bool(value, default: bool = False) -> bool:
+    """Parse a boolean flag, handling various string representations."""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        value = value.strip().lower()
+        if value in _TRUE:
+            return True
+        elif value in _FALSE:
+            return False
+    return bool(value)
+
+
+def _parse_int(value, default: int) -> int:
+    """Parse an integer value, handling comments in the value."""
+    if value is None:
+        return default
+    if isinstance(value, str):
+        # Strip a trailing comment; maxsplit=1 stops at the first '#'
+        value = value.split('#', 1)[0].strip()
+        if not value:
+            return default
+    return int(value)
+
+
+@dataclass(slots=True, frozen=True)
+class Settings:
+    """Application settings, loaded once from environment variables.
+
+    A frozen dataclass snapshot: attribute reads in hot paths are plain
+    slot lookups with no validation machinery behind them.
+    """
 
-class Settings(BaseSettings):
-    """Application settings loaded from environment variables."""
-    
     # Azure OpenAI Configuration
-    azure_openai_api_key: Optional[str] = os.getenv("AZURE_OPENAI_API_KEY")
-    azure_openai_endpoint: Optional[str] = os.getenv("AZURE_OPENAI_ENDPOINT")
-    azure_openai_api_version: str = os.getenv("AZURE_OPENAI_API_VERSION")
-    azure_openai_deployment_name: Optional[str] = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
-    azure_openai_model_name: str = os.getenv("AZURE_OPENAI_MODEL_NAME")
-    
+    azure_openai_api_key: Optional[str]
+    azure_openai_endpoint: Optional[str]
+    azure_openai_api_version: Optional[str]
+    azure_openai_deployment_name: Optional[str]
+    azure_openai_model_name: Optional[str]
+
     # Application Configuration
-    upload_dir: str = "uploads"
-    vector_store_dir: str = "vector_store"
-    max_file_size: int = Field(default=10485760, description="Maximum file size in bytes")
-    
+    upload_dir: str
+    vector_store_dir: str
+    max_file_size: int  # Maximum file size in bytes
+
     # Server Configuration
-    host: str = "0.0.0.0"
-    port: int = 8000
-    debug: bool = False
-    
+    host: str
+    port: int
+    debug: bool
+    # Uvicorn worker processes. Defaults to 1 because all state is
+    # in-process: each worker loads its own FAISS index, document metadata
+    # and conversation store, so with several workers an upload is only
+    # visible to the worker that ingested it. Raise only for serve-only
+    # deployments (ideally with FAISS_MMAP so workers share index pages).
+    workers: int
+
     # Vector Store Configuration
-    chunk_size: int = 1000
-    chunk_overlap: int = 200
-    
+    chunk_size: int
+    chunk_overlap: int
+    # FAISS index type: "flat" (exact float32 linear scan), "sq8" (int8
+    # scalar quantization — 4x smaller index and faster distance kernels,
+    # with a negligible recall hit for sentence-transformer embeddings),
+    # "pq" (product quantization, 32x smaller for RAM-constrained corpora)
+    # or "hnsw" (graph index with log-time queries, for larger corpora)
+    faiss_index_type: str
+    # Memory-map the FAISS index on load instead of reading it into RAM.
+    # Near-instant startup and shared pages across workers, but the index
+    # is read-only: suited to serve-only deployments, not live ingest.
+    faiss_mmap: bool
+
+    # Embedding Configuration
+    # Device for the local embedding model: "cuda", "cpu", or "" to
+    # auto-detect (CUDA when available)
+    embed_device: str
+    # Compile the embedding model with torch.compile (kernel fusion; pays a
+    # one-off warmup cost on the first encode)
+    embed_compile: bool
+    # Sentences per encoder forward pass. The sentence-transformers default
+    # of 32 leaves ingest throughput on the table; lower this on machines
+    # where a 128-wide batch doesn't fit in memory
+    embed_batch_size: int
+
     # Tokenizers Configuration
-    tokenizers_parallelism: bool = Field(default=False, description="Enable/disable tokenizers parallelism")
-    
-    @validator('max_file_size', pre=True)
-    def parse_max_file_size(cls, v):
-        """Parse max_file_size, handling comments in the value."""
-        if isinstance(v, str):
-            # Remove comments and whitespace
-            v = v.split('#')[0].strip()
-            return int(v)
-        return v
-    
-    @validator('debug', pre=True)
-    def parse_debug(cls, v):
-        """Parse debug flag, handling various string representations."""
-        if isinstance(v, str):
-            v = v.lower().strip()
-            if v in ('true', '1', 'yes', 'on'):
-                return True
-            elif v in ('false', '0', 'no', 'off', 'warn', 'warning'):
-                return False
-        return bool(v)
-    
-    @validator('tokenizers_parallelism', pre=True)
-    def parse_tokenizers_parallelism(cls, v):
-        """Parse tokenizers_parallelism flag, handling various string representations."""
-        if isinstance(v, str):
-            v = v.lower().strip()
-            if v in ('true', '1', 'yes', 'on'):
-                return True
-            elif v in ('false', '0', 'no', 'off'):
-                return False
-        return bool(v)
-    
-    class Config:
-        env_file = ".env"
-        case_sensitive = False
+    tokenizers_parallelism: bool
+
+
+def load_settings() -> Settings:
+    """Read the environment (and .env file) once and build the settings snapshot."""
+    load_dotenv()
+
+    return Settings(
+        azure_openai_api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        azure_openai_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+        azure_openai_api_version=os.getenv("AZURE_OPENAI_API_VERSION"),
+        azure_openai_deployment_name=os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME"),
+        azure_openai_model_name=os.getenv("AZURE_OPENAI_MODEL_NAME"),
+        upload_dir=os.getenv("UPLOAD_DIR", "uploads"),
+        vector_store_dir=os.getenv("VECTOR_STORE_DIR", "vector_store"),
+        max_file_size=_parse_int(os.getenv("MAX_FILE_SIZE"), 10485760),
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=_parse_int(os.getenv("PORT"), 8000),
+        debug=_parse_bool(os.getenv("DEBUG"), False),
+        workers=_parse_int(os.getenv("WORKERS"), 1),
+        chunk_size=_parse_int(os.getenv("CHUNK_SIZE"), 1000),
+        chunk_overlap=_parse_int(os.getenv("CHUNK_OVERLAP"), 200),
+        faiss_index_type=os.getenv("FAISS_INDEX_TYPE", "flat").strip().lower(),
+        faiss_mmap=_parse_bool(os.getenv("FAISS_MMAP"), False),
+        embed_device=os.getenv("EMBED_DEVICE", "").strip().lower(),
+        embed_compile=_parse_bool(os.getenv("EMBED_COMPILE"), False),
+        embed_batch_size=_parse_int(os.getenv("EMBED_BATCH_SIZE"), 128),
+        tokenizers_parallelism=_parse_bool(os.getenv("TOKENIZERS_PARALLELISM"), False),
+    )
 
 
 # Global settings instance
-settings = Settings()
+settings = load_settings()
+
+
+def _configure_runtime() -> None:
+    """One-off process setup: tokenizer env var and required directories.
+
+    Guards keep this cheap on repeated imports (pytest, uvicorn --reload):
+    an already-set env var is respected and existing directories skip the
+    mkdir syscalls.
+    """
+    if "TOKENIZERS_PARALLELISM" not in os.environ:
+        os.environ["TOKENIZERS_PARALLELISM"] = str(settings.tokenizers_parallelism).lower()
+
+    for path in (settings.upload_dir, settings.vector_store_dir):
+        if not os.path.isdir(path):
+            os.makedirs(path, exist_ok=True)
 
-# Set tokenizers parallelism environment variable
-os.environ["TOKENIZERS_PARALLELISM"] = str(settings.tokenizers_parallelism).lower()
 
-# Ensure required directories exist
-os.makedirs(settings.upload_dir, exist_ok=True)
-os.makedirs(settings.vector_store_dir, exist_ok=True) 
\ No newline at end of file
+_configure_runtime()
@@ -2,92 +2,273 @@
 Chat service that integrates Azure OpenAI for question answering using retrieved document context.
 """
 
+import asyncio
+import re
+import threading
+import time
 import uuid
-from typing import List, Dict, Any, Optional
-from openai import AzureOpenAI
+from collections import Counter, OrderedDict, deque
+from itertools import islice
+from typing import Deque, List, Dict, Any, Optional
+from openai import AsyncAzureOpenAI
 
 from app.core.config import settings
 from app.services.vector_store import VectorStore
 import os
 import traceback
 
+# Retrieval cache tuning: repeated/near-identical questions in a conversation
+# skip the embedding forward pass and FAISS query entirely on a hit.
+SEARCH_CACHE_SIZE = 512
+SEARCH_CACHE_TTL = 300  # seconds
+
+# Prefetch tuning: follow-up questions usually stay on topic, so after each
+# answer we warm the retrieval cache for a few keyword-derived queries.
+PREFETCH_MAX_QUERIES = 3
+PREFETCH_MAX_CONCURRENCY = 2
+
+# Cap on tracked conversations: cold ones are evicted LRU-first so a
+# long-running server can't leak memory one conversation_id at a time
+MAX_CONVERSATIONS = 1000
+
+# Per-conversation history bounds (in messages, i.e. 2 per exchange)
+MAX_HISTORY_MESSAGES = 20
+HISTORY_CONTEXT_MESSAGES = 6  # last 3 Q&A pairs sent to the model
+
+_WORD_RE = re.compile(r"[a-zA-Z][a-zA-Z0-9'-]{3,}")
+
+# System prompt pieces, built once at import. The static instruction message
+# is byte-identical on every request and sent first, so it forms a stable
+# prefix the provider's prompt cache can reuse (lower latency and input-token
+# cost on cached prefixes); only the per-turn context message varies.
+_STATIC_SYSTEM = """You are a helpful AI assistant that answers questions based on the provided document context. A separate system message supplies the context retrieved for the current question.
+
+INSTRUCTIONS:
+1. Answer the user's question using ONLY the information provided in the context
+2. If the context doesn't contain enough information to answer the question, say so clearly
+3. Always cite which document(s) you're referencing in your answer
+4. Be concise but comprehensive
+5. If asked about something not in the documents, explain that the information is not available in the uploaded documents
+
+Remember: Only use information from the provided context. Do not make up information or use knowledge outside of the provided documents."""
+
+_NO_CONTEXT_CONTENT = """No relevant documents were found in the knowledge base for this question. Let the user know that you don't have specific information about their query in the uploaded documents, but you can provide general assistance if helpful."""
+
+_CONTEXT_HEADER = """CONTEXT FROM UPLOADED DOCUMENTS:
+"""
+
+# Common English words that make poor retrieval queries on their own.
+_STOPWORDS = frozenset({
+    "about", "above", "after", "again", "also", "another", "answer", "based",
+    "because", "been", "before", "being", "between", "both", "could", "does",
+    "document", "documents", "each", "found", "from", "have", "here", "information",
+    "into", "just", "more", "most", "only", "other", "over", "please", "provided",
+    "question", "regarding", "said", "should", "some", "such", "than", "that",
+    "their", "them", "then", "there", "these", "they", "this", "those", "through",
+    "under", "upload", "uploaded", "using", "very", "what", "when", "where",
+    "which", "while", "will", "with", "would", "your"
+})
+
+
 class ChatService:
     """Service for handling chat interactions with document context."""
-    
+
     def __init__(self, vector_store: VectorStore):
         self.vector_store = vector_store
+        # LRU cache of (normalized question, k) -> (timestamp, context chunks).
+        # Touched from asyncio.to_thread executor threads and the prefetch
+        # daemon threads, so every read/expire/insert/evict sequence runs
+        # under this lock — an unguarded expire racing another request's
+        # delete raises KeyError mid-chat.
+        self._search_cache: OrderedDict = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Bounds how many background prefetch threads run at once
+        self._prefetch_semaphore = threading.Semaphore(PREFETCH_MAX_CONCURRENCY)
         
         # Initialize LLM only if Azure OpenAI is properly configured
         if (settings.azure_openai_api_key and 
             settings.azure_openai_endpoint and 
             settings.azure_openai_deployment_name):
             try:
-                self.llm = AzureOpenAI(
+                self.llm = AsyncAzureOpenAI(
                     api_key=settings.azure_openai_api_key,
                     azure_endpoint=settings.azure_openai_endpoint,
                     api_version=settings.azure_openai_api_version
                 )
-                print(self.llm)
-                # Test the connection
-                try:
-                    test_response = self.llm.chat.completions.create(
-                        model=settings.azure_openai_deployment_name,
-                        messages=[{"role": "user", "content": "Hello"}],
-                        max_tokens=5,
-                        timeout=10
-                    )
-                    print("✅ Azure OpenAI chat service configured and tested successfully")
-                except Exception as e:
-                    print(f"⚠️  Azure OpenAI test connection failed: {e}")
-                    print("🔄 Will proceed without test - connection will be verified during actual use")
-                    # Don't set self.llm = None here, let it try during actual chat
+                # No test completion here: it added up to 10s of blocking
+                # network I/O per worker boot, and the per-request error
+                # handling in chat() surfaces auth/network problems anyway
+                print("✅ Azure OpenAI client initialized (connection verified on first request)")
             except Exception as e:
                 print(f"⚠️  Azure OpenAI chat connection failed: {e}")
                 self.llm = None
         else:
             self.llm = None
             print("⚠️  Azure OpenAI not configured. Chat service will work in limited mode.")
-        # Store conversation history
-        self.conversations: Dict[str, List[Dict[str, str]]] = {}
+        # Store conversation history, LRU-ordered so the oldest untouched
+        # conversation is evicted first once MAX_CONVERSATIONS is reached.
+        # Entries are deques of messages already in OpenAI API shape, capped
+        # at MAX_HISTORY_MESSAGES so old messages fall off automatically.
+        self.conversations: "OrderedDict[str, Deque[Dict[str, str]]]" = OrderedDict()
     
-    def _create_system_prompt(self, context_chunks: List[Dict[str, Any]]) -> str:
-        """Create system prompt with document context."""
-        if not context_chunks:
-            return """You are a helpful AI assistant. The user is asking a question, but no relevant documents were found in the knowledge base. Please let them know that you don't have specific information about their query in the uploaded documents, but you can provide general assistance if helpful."""
-        
-        context_text = "\n\n".join([
-            f"Document: {chunk['filename']}\nContent: {chunk['text']}"
-            for chunk in context_chunks
-        ])
-        
-        return f"""You are a helpful AI assistant that answers questions based on the provided document context. 
+    def _cached_search(self, question: str, k: int) -> List[Dict[str, Any]]:
+        """Similarity search with an LRU + TTL cache keyed by normalized question.
 
-CONTEXT FROM UPLOADED DOCUMENTS:
-{context_text}
+        The embedding forward pass dominates retrieval cost for the local
+        model, so repeat questions (common in multi-turn chats) are served
+        straight from the cache. Entries expire after SEARCH_CACHE_TTL so
+        newly uploaded documents show up within a bounded window.
+        """
+        cache_key = (question.strip().lower(), k)
+        now = time.monotonic()
 
-INSTRUCTIONS:
-1. Answer the user's question using ONLY the information provided in the context above
-2. If the context doesn't contain enough information to answer the question, say so clearly
-3. Always cite which document(s) you're referencing in your answer
-4. Be concise but comprehensive
-5. If asked about something not in the documents, explain that the information is not available in the uploaded documents
+        with self._cache_lock:
+            cached = self._search_cache.get(cache_key)
+            if cached is not None:
+                timestamp, chunks = cached
+                if now - timestamp < SEARCH_CACHE_TTL:
+                    self._search_cache.move_to_end(cache_key)
+                    return chunks
+                del self._search_cache[cache_key]
 
-Remember: Only use information from the provided context. Do not make up information or use knowledge outside of the provided documents."""
+        # The search itself runs unlocked so concurrent questions aren't
+        # serialized behind the encoder; two simultaneous misses on the
+        # same key just do the work twice
+        chunks = self.vector_store.similarity_search(question, k=k)
+
+        with self._cache_lock:
+            self._search_cache[cache_key] = (now, chunks)
+            while len(self._search_cache) > SEARCH_CACHE_SIZE:
+                self._search_cache.popitem(last=False)
+
+        return chunks
+
+    def _predict_followup_queries(self, question: str, answer: str) -> List[str]:
+        """Derive a few likely follow-up queries from the last answer.
+
+        Uses cheap keyword extraction (regex + stopword filter + frequency),
+        not an LLM call: the goal is just to warm the retrieval cache, so a
+        rough guess is good enough.
+        """
+        words = [w.lower() for w in _WORD_RE.findall(answer)]
+        keywords = [w for w, _ in Counter(
+            w for w in words if w not in _STOPWORDS
+        ).most_common(PREFETCH_MAX_QUERIES)]
+
+        return [f"{question} {keyword}" for keyword in keywords]
+
+    def _prefetch(self, question: str, answer: str, k: int) -> None:
+        """Warm the retrieval cache for predicted follow-up questions.
+
+        Uncached candidates go through the batched search path so the whole
+        prediction set costs one encoder forward pass and one FAISS call.
+        """
+        with self._prefetch_semaphore:
+            try:
+                now = time.monotonic()
+                with self._cache_lock:
+                    queries = [
+                        q for q in self._predict_followup_queries(question, answer)
+                        if (q.strip().lower(), k) not in self._search_cache
+                    ]
+                if not queries:
+                    return
+
+                results = self.vector_store.similarity_search_batch(queries, k=k)
+
+                with self._cache_lock:
+                    for query, chunks in zip(queries, results):
+                        self._search_cache[(query.strip().lower(), k)] = (now, chunks)
+
+                    while len(self._search_cache) > SEARCH_CACHE_SIZE:
+                        self._search_cache.popitem(last=False)
+            except Exception as e:
+                # Prefetch is purely opportunistic; never surface failures
+                print(f"⚠️  Prefetch failed: {e}")
+
+    def _start_prefetch(self, question: str, answer: str, k: int) -> None:
+        """Kick off cache warming in the background after an answer is sent."""
+        thread = threading.Thread(
+            target=self._prefetch,
+            args=(question, answer, k),
+            daemon=True,
+        )
+        thread.start()
+
+    def _create_context_content(self, context_chunks: List[Dict[str, Any]]) -> str:
+        """Create the per-turn context system message content."""
+        if not context_chunks:
+            return _NO_CONTEXT_CONTENT
+
+        # Single join over flat string parts: one final allocation instead of
+        # an intermediate f-string per chunk plus a second join pass
+        parts = [_CONTEXT_HEADER]
+        for chunk in context_chunks:
+            parts.extend(("Document: ", chunk['filename'],
+                          "\nContent: ", chunk['text'], "\n\n"))
+        parts[-1] = ""  # drop the trailing separator
+
+        return "".join(parts)
     
     def _format_sources(self, context_chunks: List[Dict[str, Any]]) -> List[str]:
         """Format source information from context chunks."""
         sources = []
-        seen_docs = set()
-        
+        seen = set()
+
+        # Dedupe on the raw (filename, chunk_index) tuple so the display
+        # string is only built for chunks that actually make the list
         for chunk in context_chunks:
-            doc_info = f"{chunk['filename']} (chunk {chunk['chunk_index'] + 1})"
-            if doc_info not in seen_docs:
-                sources.append(doc_info)
-                seen_docs.add(doc_info)
-        
+            key = (chunk['filename'], chunk['chunk_index'])
+            if key in seen:
+                continue
+            seen.add(key)
+            sources.append(f"{key[0]} (chunk {key[1] + 1})")
+
         return sources
     
-    def chat(self, question: str, conversation_id: Optional[str] = None, k: int = 5) -> Dict[str, Any]:
+    def _build_messages(self, question: str, conversation_id: str,
+                        context_chunks: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+        """Assemble the OpenAI message list for one turn.
+
+        The static instruction message leads so it stays a cacheable prefix;
+        the retrieved context rides in its own system message. History is
+        stored in API shape already, so the recent window is spliced in
+        without any per-entry transformation.
+        """
+        history = self.conversations.get(conversation_id)
+        if history:
+            recent_history = islice(
+                history, max(0, len(history) - HISTORY_CONTEXT_MESSAGES), None
+            )
+        else:
+            recent_history = ()
+
+        return [
+            {"role": "system", "content": _STATIC_SYSTEM},
+            {"role": "system", "content": self._create_context_content(context_chunks)},
+            *recent_history,
+            {"role": "user", "content": question}
+        ]
+
+    def _store_exchange(self, conversation_id: str, question: str, answer: str) -> None:
+        """Record one Q&A exchange, keeping both per-conversation and
+        cross-conversation memory bounded."""
+        # The deque's maxlen drops the oldest messages once the
+        # per-conversation cap is reached
+        if conversation_id not in self.conversations:
+            self.conversations[conversation_id] = deque(maxlen=MAX_HISTORY_MESSAGES)
+        self._touch(conversation_id)
+
+        self.conversations[conversation_id].extend((
+            {"role": "user", "content": question},
+            {"role": "assistant", "content": answer}
+        ))
+
+        # Evict the coldest conversations once over the cap
+        while len(self.conversations) > MAX_CONVERSATIONS:
+            self.conversations.popitem(last=False)
+
+    async def chat(self, question: str, conversation_id: Optional[str] = None, k: int = 5) -> Dict[str, Any]:
         """Process a chat question and return an answer with sources."""
         
         # Generate conversation ID if not provided
@@ -104,36 +285,19 @@ Remember: Only use information from the provided context. Do not make up informa
             }
         
         try:
-            # Retrieve relevant context from vector store
-            context_chunks = self.vector_store.similarity_search(question, k=k)
-            
-            # Create system prompt with context
-            system_prompt = self._create_system_prompt(context_chunks)
+            # Retrieve relevant context from vector store (cached per
+            # question). The embedding forward pass is CPU-bound sync work,
+            # so it runs in a worker thread to keep the event loop free.
+            context_chunks = await asyncio.to_thread(self._cached_search, question, k)
             
             # Prepare messages for OpenAI API
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": question}
-            ]
-            
-            # Add conversation history if available
-            if conversation_id in self.conversations:
-                # Add recent conversation history (last 3 exchanges)
-                recent_history = self.conversations[conversation_id][-6:]  # 3 Q&A pairs
-                history_messages = []
-                for entry in recent_history:
-                    if entry["role"] == "user":
-                        history_messages.append({"role": "user", "content": entry["content"]})
-                    elif entry["role"] == "assistant":
-                        history_messages.append({"role": "assistant", "content": entry["content"]})
-                
-                # Insert history before the current question
-                messages = [messages[0]] + history_messages + [messages[1]]
-            
+            messages = self._build_messages(question, conversation_id, context_chunks)
+
+
             # Get response from Azure OpenAI
             try:
                 print(f"🔄 Sending request to Azure OpenAI with {len(messages)} messages...")
-                response = self.llm.chat.completions.create(
+                response = await self.llm.chat.completions.create(
                     model=settings.azure_openai_deployment_name,
                     messages=messages,
                     max_tokens=1000,
@@ -157,20 +321,14 @@ Remember: Only use information from the provided context. Do not make up informa
             
             # Format sources
             sources = self._format_sources(context_chunks)
-            
+
             # Store conversation history
-            if conversation_id not in self.conversations:
-                self.conversations[conversation_id] = []
-            
-            self.conversations[conversation_id].extend([
-                {"role": "user", "content": question},
-                {"role": "assistant", "content": answer}
-            ])
-            
-            # Keep only last 10 exchanges per conversation
-            if len(self.conversations[conversation_id]) > 20:
-                self.conversations[conversation_id] = self.conversations[conversation_id][-20:]
-            
+            self._store_exchange(conversation_id, question, answer)
+
+            # Warm the retrieval cache for likely follow-up questions while
+            # the user reads this answer
+            self._start_prefetch(question, answer, k)
+
             return {
                 "answer": answer,
                 "sources": sources,
@@ -189,10 +347,84 @@ Remember: Only use information from the provided context. Do not make up informa
                 "error": error_msg
             }
     
+    async def chat_stream(self, question: str, conversation_id: Optional[str] = None, k: int = 5):
+        """Stream an answer as it is generated.
+
+        Async generator yielding event dicts: {"delta": ...} for each piece
+        of the answer, then a final {"sources": ..., "conversation_id": ...,
+        "done": True}. The first tokens reach the client in a few hundred
+        milliseconds instead of after the full completion.
+        """
+        # Generate conversation ID if not provided
+        if not conversation_id:
+            conversation_id = str(uuid.uuid4())
+
+        # Check if LLM is configured
+        if not self.llm:
+            yield {
+                "delta": "I apologize, but the AI chat service is not configured. Please set up your Azure OpenAI credentials in the .env file to enable chat functionality."
+            }
+            yield {
+                "sources": [],
+                "conversation_id": conversation_id,
+                "error": "Azure OpenAI not configured",
+                "done": True
+            }
+            return
+
+        try:
+            context_chunks = await asyncio.to_thread(self._cached_search, question, k)
+            messages = self._build_messages(question, conversation_id, context_chunks)
+
+            stream = await self.llm.chat.completions.create(
+                model=settings.azure_openai_deployment_name,
+                messages=messages,
+                max_tokens=1000,
+                temperature=0.7,
+                timeout=30,
+                stream=True
+            )
+
+            # Forward deltas as they arrive, accumulating the full answer
+            # for conversation history
+            answer_parts = []
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    answer_parts.append(delta)
+                    yield {"delta": delta}
+
+            answer = "".join(answer_parts)
+            self._store_exchange(conversation_id, question, answer)
+            self._start_prefetch(question, answer, k)
+
+            yield {
+                "sources": self._format_sources(context_chunks),
+                "conversation_id": conversation_id,
+                "context_chunks_found": len(context_chunks),
+                "done": True
+            }
+
+        except Exception as e:
+            error_msg = f"Error processing chat request: {str(e)}"
+            print(f"{error_msg} {traceback.format_exc()}")
+            yield {
+                "sources": [],
+                "conversation_id": conversation_id,
+                "error": error_msg,
+                "done": True
+            }
+
+    def _touch(self, conversation_id: str) -> None:
+        """Mark a conversation as recently used for LRU eviction."""
+        self.conversations.move_to_end(conversation_id)
+
     def get_conversation_history(self, conversation_id: str) -> List[Dict[str, str]]:
         """Get conversation history for a given conversation ID."""
-        return self.conversations.get(conversation_id, [])
-    
+        return list(self.conversations.get(conversation_id, ()))
+
     def clear_conversation(self, conversation_id: str) -> bool:
         """Clear conversation history for a given conversation ID."""
         if conversation_id in self.conversations:
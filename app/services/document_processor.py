@@ -4,13 +4,29 @@ Document processing service for handling file uploads and text extraction.
 
 import os
 import uuid
-import json
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree.ElementTree import iterparse
 from datetime import datetime
 from typing import List, Dict, Any
-from pathlib import Path
 
+import orjson
 import PyPDF2
 from docx import Document
+
+try:
+    # PyMuPDF parses with a C backend, roughly an order of magnitude faster
+    # than PyPDF2's pure-Python parser on typical PDFs
+    import fitz  # PyMuPDF
+except ImportError:
+    fitz = None
+
+# Below this page count, thread startup costs more than it saves
+PARALLEL_PDF_MIN_PAGES = 8
+PARALLEL_PDF_MAX_WORKERS = 8
+
+# WordprocessingML namespace used by the text nodes in word/document.xml
+_DOCX_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 
 from app.core.config import settings
@@ -23,46 +39,162 @@ class DocumentProcessor:
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=settings.chunk_size,
             chunk_overlap=settings.chunk_overlap,
+            # len is a C-level call — the fastest length function available.
+            # Separators are passed explicitly, ordered from the paragraph
+            # breaks the extractors emit down to single spaces, so the
+            # splitter binds to this list once instead of deriving it from
+            # defaults per instance.
             length_function=len,
+            separators=["\n\n", "\n", ". ", " ", ""],
         )
-        self.metadata_file = os.path.join(settings.upload_dir, "metadata.json")
+        # Extension -> extractor dispatch; lookup is one dict probe instead
+        # of a chain of lowercased comparisons per document
+        self._extractors = {
+            '.pdf': self.extract_text_from_pdf,
+            '.docx': self.extract_text_from_docx,
+            '.txt': self.extract_text_from_txt,
+        }
+        self.metadata_file = os.path.join(settings.upload_dir, "metadata.jsonl")
         self._load_metadata()
-    
+
     def _load_metadata(self) -> None:
-        """Load document metadata from file."""
-        if os.path.exists(self.metadata_file):
-            with open(self.metadata_file, 'r') as f:
-                self.metadata = json.load(f)
-        else:
-            self.metadata = {}
-    
-    def _save_metadata(self) -> None:
-        """Save document metadata to file."""
-        with open(self.metadata_file, 'w') as f:
-            json.dump(self.metadata, f, indent=2)
+        """Replay the append-only metadata log.
+
+        Each line is one document record or a tombstone; later lines win.
+        The log is compacted on load once tombstones have accumulated, so
+        steady-state updates stay O(1) appends.
+        """
+        self.metadata = {}
+
+        # One-off migration from the old whole-file JSON format
+        legacy_file = os.path.join(settings.upload_dir, "metadata.json")
+        if not os.path.exists(self.metadata_file) and os.path.exists(legacy_file):
+            with open(legacy_file, 'rb') as f:
+                self.metadata = orjson.loads(f.read())
+            self._rewrite_log()
+            os.remove(legacy_file)
+            return
+
+        if not os.path.exists(self.metadata_file):
+            return
+
+        tombstones = 0
+        with open(self.metadata_file, 'rb') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = orjson.loads(line)
+                if record.get("deleted"):
+                    self.metadata.pop(record["document_id"], None)
+                    tombstones += 1
+                else:
+                    self.metadata[record["document_id"]] = record
+
+        if tombstones:
+            self._rewrite_log()
+
+    def _append_record(self, record: Dict[str, Any]) -> None:
+        """Append one record to the metadata log.
+
+        O(1) per update — the old approach re-serialized every document's
+        metadata (pretty-printed, doubling the bytes) on each change.
+        orjson serializes straight to compact bytes in C, several times
+        faster than stdlib json's string building.
+        """
+        with open(self.metadata_file, 'ab') as f:
+            f.write(orjson.dumps(record) + b"\n")
+
+    def _rewrite_log(self) -> None:
+        """Compact the log down to one live record per document."""
+        with open(self.metadata_file, 'wb') as f:
+            for record in self.metadata.values():
+                f.write(orjson.dumps(record) + b"\n")
     
     def extract_text_from_pdf(self, file_path: str) -> str:
-        """Extract text from PDF file."""
-        text = ""
+        """Extract text from PDF file.
+
+        Prefers PyMuPDF; falls back to PyPDF2 where PyMuPDF isn't installed.
+        Page texts are collected in a list and joined once, which is linear
+        in total text size instead of the quadratic growth of += in a loop.
+        """
         try:
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
+            if fitz is not None:
+                with fitz.open(file_path) as doc:
+                    page_count = doc.page_count
+                    if page_count < PARALLEL_PDF_MIN_PAGES:
+                        parts = [page.get_text("text") for page in doc]
+                    else:
+                        parts = None
+                if parts is None:
+                    parts = self._extract_pdf_pages_parallel(file_path, page_count)
+            else:
+                with open(file_path, 'rb') as file:
+                    pdf_reader = PyPDF2.PdfReader(file)
+                    parts = [page.extract_text() for page in pdf_reader.pages]
         except Exception as e:
             raise ValueError(f"Error extracting text from PDF: {str(e)}")
-        return text
+        return "\n".join(parts)
+
+    def _extract_pdf_pages_parallel(self, file_path: str, page_count: int) -> List[str]:
+        """Extract pages of a large PDF across a thread pool.
+
+        Page extraction is independent and PyMuPDF releases the GIL in its
+        C core, so this scales with cores. Each worker opens its own
+        document handle — PyMuPDF documents are not safe to share across
+        threads — which is cheap since the file is memory-mapped.
+        """
+        workers = min(PARALLEL_PDF_MAX_WORKERS, os.cpu_count() or 1, page_count)
+        pages_per_worker = -(-page_count // workers)  # ceil division
+
+        def extract_range(start: int) -> List[str]:
+            stop = min(start + pages_per_worker, page_count)
+            with fitz.open(file_path) as doc:
+                return [doc.load_page(i).get_text("text") for i in range(start, stop)]
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            ranges = range(0, page_count, pages_per_worker)
+            return [text for batch in executor.map(extract_range, ranges) for text in batch]
     
     def extract_text_from_docx(self, file_path: str) -> str:
-        """Extract text from DOCX file."""
+        """Extract text from DOCX file.
+
+        Streams word/document.xml straight out of the archive, which skips
+        python-docx's construction of Paragraph/Run wrapper objects for
+        every XML node — wasted work when only the plain text is wanted.
+        Falls back to python-docx for files the streaming path can't read.
+        """
+        try:
+            return self._extract_docx_streaming(file_path)
+        except Exception:
+            pass
+
         try:
             doc = Document(file_path)
-            text = ""
-            for paragraph in doc.paragraphs:
-                text += paragraph.text + "\n"
+            parts = [paragraph.text for paragraph in doc.paragraphs]
         except Exception as e:
             raise ValueError(f"Error extracting text from DOCX: {str(e)}")
-        return text
+        return "\n".join(parts)
+
+    def _extract_docx_streaming(self, file_path: str) -> str:
+        """Pull the text nodes out of word/document.xml with iterparse.
+
+        Elements are cleared as soon as they close, so memory stays flat
+        regardless of document size. Paragraph ends become newlines to
+        preserve the breaks the text splitter keys on.
+        """
+        text_tag = _DOCX_NS + "t"
+        paragraph_tag = _DOCX_NS + "p"
+        parts = []
+        with zipfile.ZipFile(file_path) as archive:
+            with archive.open("word/document.xml") as xml_stream:
+                for _, element in iterparse(xml_stream):
+                    if element.tag == text_tag:
+                        parts.append(element.text or "")
+                    elif element.tag == paragraph_tag:
+                        parts.append("\n")
+                    element.clear()
+        return "".join(parts)
     
     def extract_text_from_txt(self, file_path: str) -> str:
         """Extract text from TXT file."""
@@ -75,19 +207,16 @@ class DocumentProcessor:
     
     def extract_text(self, file_path: str, file_extension: str) -> str:
         """Extract text from file based on extension."""
-        if file_extension.lower() == '.pdf':
-            return self.extract_text_from_pdf(file_path)
-        elif file_extension.lower() == '.docx':
-            return self.extract_text_from_docx(file_path)
-        elif file_extension.lower() == '.txt':
-            return self.extract_text_from_txt(file_path)
-        else:
+        extractor = self._extractors.get(file_extension.lower())
+        if extractor is None:
             raise ValueError(f"Unsupported file type: {file_extension}")
+        return extractor(file_path)
     
     def process_document(self, file_path: str, filename: str) -> Dict[str, Any]:
         """Process uploaded document and extract text chunks."""
         document_id = str(uuid.uuid4())
-        file_extension = Path(filename).suffix
+        # splitext avoids constructing a Path object just to read the suffix
+        file_extension = os.path.splitext(filename)[1]
         
         try:
             # Extract text from document
@@ -113,7 +242,7 @@ class DocumentProcessor:
             }
             
             self.metadata[document_id] = metadata
-            self._save_metadata()
+            self._append_record(metadata)
             
             return {
                 "document_id": document_id,
@@ -126,7 +255,7 @@ class DocumentProcessor:
             if document_id in self.metadata:
                 self.metadata[document_id]["status"] = "error"
                 self.metadata[document_id]["error"] = str(e)
-                self._save_metadata()
+                self._append_record(self.metadata[document_id])
             raise e
     
     def get_document_info(self, document_id: str) -> Dict[str, Any]:
@@ -149,8 +278,8 @@ class DocumentProcessor:
         if file_path and os.path.exists(file_path):
             os.remove(file_path)
         
-        # Remove metadata
+        # Remove metadata; the tombstone is dropped when the log is compacted
         del self.metadata[document_id]
-        self._save_metadata()
+        self._append_record({"document_id": document_id, "deleted": True})
         
         return True 
\ No newline at end of file
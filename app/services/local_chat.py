@@ -3,30 +3,45 @@ Local chat service that provides basic responses using document context.
 Works without external LLM APIs.
 """
 
+import asyncio
 import uuid
-from typing import List, Dict, Any, Optional
-from app.services.vector_store import VectorStore
+from collections import OrderedDict, deque
+from typing import Deque, List, Dict, Any, Optional
+from app.services.vector_store import VectorStore, _truncate_preview
+
+# Cross-conversation memory bound: least-recently-active conversations are
+# evicted once this many are tracked (same policy as ChatService)
+MAX_CONVERSATIONS = 1000
+
+# Per-conversation history bound (in messages, i.e. 2 per exchange)
+MAX_HISTORY_MESSAGES = 20
 
 
 class LocalChatService:
     """Local chat service that provides responses based on document context."""
-    
+
     def __init__(self, vector_store: VectorStore):
         self.vector_store = vector_store
-        # Store conversation history
-        self.conversations: Dict[str, List[Dict[str, str]]] = {}
+        # Conversation history as an LRU: iteration order is recency, so
+        # the least-recently-active conversation is evicted first once
+        # MAX_CONVERSATIONS is reached. Entries are deques capped at
+        # MAX_HISTORY_MESSAGES so old messages fall off automatically.
+        self.conversations: "OrderedDict[str, Deque[Dict[str, str]]]" = OrderedDict()
     
     def _format_sources(self, context_chunks: List[Dict[str, Any]]) -> List[str]:
         """Format source information from context chunks."""
         sources = []
-        seen_docs = set()
-        
+        seen = set()
+
+        # Dedupe on the raw (filename, chunk_index) tuple so the display
+        # string is only built for chunks that actually make the list
         for chunk in context_chunks:
-            doc_info = f"{chunk['filename']} (chunk {chunk['chunk_index'] + 1})"
-            if doc_info not in seen_docs:
-                sources.append(doc_info)
-                seen_docs.add(doc_info)
-        
+            key = (chunk['filename'], chunk['chunk_index'])
+            if key in seen:
+                continue
+            seen.add(key)
+            sources.append(f"{key[0]} (chunk {key[1] + 1})")
+
         return sources
     
     def _create_simple_response(self, question: str, context_chunks: List[Dict[str, Any]]) -> str:
@@ -34,18 +49,14 @@ class LocalChatService:
         if not context_chunks:
             return f"I couldn't find any relevant information about '{question}' in the uploaded documents. Please make sure you've uploaded documents that contain information related to your question."
         
-        # Extract the most relevant text snippets
-        relevant_texts = []
-        for chunk in context_chunks[:3]:  # Use top 3 most relevant chunks
-            text = chunk['text'].strip()
-            if len(text) > 200:
-                # Truncate long texts but try to keep complete sentences
-                sentences = text.split('. ')
-                truncated = '. '.join(sentences[:2])
-                if len(truncated) < 150 and len(sentences) > 2:
-                    truncated = '. '.join(sentences[:3])
-                text = truncated + '...' if len(truncated) < len(chunk['text']) else truncated
-            relevant_texts.append(text)
+        # Use the previews precomputed at ingest for the top 3 chunks; the
+        # sentence splitting is done once per chunk at add time instead of
+        # per chunk per request. Chunks stored before previews existed fall
+        # back to truncating on the fly.
+        relevant_texts = [
+            chunk.get('preview') or _truncate_preview(chunk['text'])
+            for chunk in context_chunks[:3]
+        ]
         
         # Create a simple response
         response_parts = [
@@ -61,16 +72,20 @@ class LocalChatService:
         
         return "\n".join(response_parts)
     
-    def chat(self, question: str, conversation_id: Optional[str] = None, k: int = 5) -> Dict[str, Any]:
+    async def chat(self, question: str, conversation_id: Optional[str] = None, k: int = 5) -> Dict[str, Any]:
         """Process a chat question and return a response with sources."""
-        
+
         # Generate conversation ID if not provided
         if not conversation_id:
             conversation_id = str(uuid.uuid4())
-        
+
         try:
-            # Retrieve relevant context from vector store
-            context_chunks = self.vector_store.similarity_search(question, k=k)
+            # Retrieve relevant context from vector store. The embedding
+            # forward pass is CPU-bound sync work, so it runs in a worker
+            # thread to keep the event loop free.
+            context_chunks = await asyncio.to_thread(
+                self.vector_store.similarity_search, question, k
+            )
             
             # Create simple response
             answer = self._create_simple_response(question, context_chunks)
@@ -78,18 +93,20 @@ class LocalChatService:
             # Format sources
             sources = self._format_sources(context_chunks)
             
-            # Store conversation history
+            # Store conversation history; the deque's maxlen drops the
+            # oldest messages once the per-conversation cap is reached
             if conversation_id not in self.conversations:
-                self.conversations[conversation_id] = []
-            
-            self.conversations[conversation_id].extend([
+                self.conversations[conversation_id] = deque(maxlen=MAX_HISTORY_MESSAGES)
+            self.conversations.move_to_end(conversation_id)
+
+            self.conversations[conversation_id].extend((
                 {"role": "user", "content": question},
                 {"role": "assistant", "content": answer}
-            ])
-            
-            # Keep only last 10 exchanges per conversation
-            if len(self.conversations[conversation_id]) > 20:
-                self.conversations[conversation_id] = self.conversations[conversation_id][-20:]
+            ))
+
+            # Evict the coldest conversations once over the cap
+            while len(self.conversations) > MAX_CONVERSATIONS:
+                self.conversations.popitem(last=False)
             
             return {
                 "answer": answer,
@@ -111,9 +128,29 @@ class LocalChatService:
                 "chat_type": "local"
             }
     
+    async def chat_stream(self, question: str, conversation_id: Optional[str] = None, k: int = 5):
+        """Stream a response in the same event shape as ChatService.chat_stream.
+
+        The local response is computed in one step, so it is emitted as a
+        single delta followed by the final event — the endpoint can serve
+        either backend over the same SSE contract.
+        """
+        result = await self.chat(question, conversation_id=conversation_id, k=k)
+
+        yield {"delta": result["answer"]}
+
+        final = {
+            "sources": result["sources"],
+            "conversation_id": result["conversation_id"],
+            "done": True
+        }
+        if "error" in result:
+            final["error"] = result["error"]
+        yield final
+
     def get_conversation_history(self, conversation_id: str) -> List[Dict[str, str]]:
         """Get conversation history for a given conversation ID."""
-        return self.conversations.get(conversation_id, [])
+        return list(self.conversations.get(conversation_id, ()))
     
     def clear_conversation(self, conversation_id: str) -> bool:
         """Clear conversation history for a given conversation ID."""
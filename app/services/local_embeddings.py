@@ -8,8 +8,25 @@ from typing import List
 from sentence_transformers import SentenceTransformer
 import numpy as np
 
-# Fix tokenizers parallelism warning
-os.environ["TOKENIZERS_PARALLELISM"] = "false"
+from app.core.config import settings
+
+# TOKENIZERS_PARALLELISM is set centrally by app.core.config from the
+# tokenizers_parallelism setting; setting it here as well would override
+# the configured value.
+
+def _resolve_device() -> str:
+    """Pick the embedding device: settings override, else CUDA when available."""
+    if settings.embed_device:
+        return settings.embed_device
+
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return "cuda"
+    except ImportError:
+        pass
+
+    return "cpu"
 
 
 class LocalEmbeddings:
@@ -31,8 +48,23 @@ class LocalEmbeddings:
     def _load_model(self):
         """Load the sentence transformer model."""
         try:
-            print(f"🤖 Loading local embedding model: {self.model_name}")
-            self.model = SentenceTransformer(self.model_name)
+            device = _resolve_device()
+            if device == "cpu":
+                # Let the intra-op thread pool use every core for the
+                # encoder matmuls
+                try:
+                    import torch
+                    torch.set_num_threads(os.cpu_count() or 1)
+                except ImportError:
+                    pass
+            print(f"🤖 Loading local embedding model: {self.model_name} (device: {device})")
+            self.model = SentenceTransformer(self.model_name, device=device)
+            if device == "cuda":
+                # FP16 halves memory bandwidth and lets the GEMMs hit tensor
+                # cores; _encode casts results back to float32 for FAISS
+                self.model.half()
+            if settings.embed_compile:
+                self._compile_model()
             print(f"✅ Local embedding model loaded successfully")
             
             # Update dimension based on the actual model
@@ -44,51 +76,105 @@ class LocalEmbeddings:
             print(f"❌ Failed to load local embedding model: {e}")
             raise e
     
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+    def _compile_model(self):
+        """Compile the transformer backbone with torch.compile.
+
+        Fuses attention/LayerNorm/GELU kernels so each encode pass makes
+        fewer trips through Python and memory — typically 2-3x on CPU.
+        Opt-in via EMBED_COMPILE because the first encode pays a warmup
+        compilation cost. Falls back silently if compilation is unsupported.
+        """
+        try:
+            import torch
+            # Compile the underlying transformer module; the surrounding
+            # pooling/normalization layers are negligible
+            backbone = self.model[0].auto_model
+            self.model[0].auto_model = torch.compile(backbone, mode="reduce-overhead")
+            print("⚡ Embedding model compiled with torch.compile")
+        except Exception as e:
+            print(f"⚠️  torch.compile unavailable, using eager model: {e}")
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode a batch of texts with a single model call.
+
+        Both document and query embeddings go through this one code path so
+        callers can coalesce multiple texts into a single forward pass instead
+        of paying the per-call model dispatch overhead for each item.
+
+        Returns a contiguous float32 array — the layout FAISS consumes
+        directly, with no per-float Python object boxing.
+        """
+        if not self.model:
+            raise ValueError("Local embedding model not loaded")
+
+        embeddings = self.model.encode(
+            texts,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            # Wide batches amortize dispatch overhead and keep the matmuls
+            # full during ingest; tunable via EMBED_BATCH_SIZE for machines
+            # where the 128 default doesn't fit in memory
+            batch_size=settings.embed_batch_size,
+            # The default progress bar prints per encode call — noise and
+            # wasted stderr writes inside an API server
+            show_progress_bar=False,
+        )
+        return embeddings.astype(np.float32, copy=False)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
         """
         Generate embeddings for a list of documents.
-        
+
         Args:
             texts: List of text documents to embed
-            
+
         Returns:
-            List of embeddings (each embedding is a list of floats)
+            float32 array of shape (len(texts), dimension)
         """
-        if not self.model:
-            raise ValueError("Local embedding model not loaded")
-        
         try:
-            # Generate embeddings
-            embeddings = self.model.encode(texts, convert_to_numpy=True)
-            
-            # Convert to list of lists for compatibility
-            return embeddings.tolist()
-            
+            # Generate embeddings in one batched call
+            return self._encode(texts)
+
         except Exception as e:
             raise ValueError(f"Error generating document embeddings: {str(e)}")
-    
-    def embed_query(self, text: str) -> List[float]:
+
+    def embed_query(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single query.
-        
+
         Args:
             text: Query text to embed
-            
+
         Returns:
-            Embedding as a list of floats
+            float32 array of shape (dimension,)
         """
-        if not self.model:
-            raise ValueError("Local embedding model not loaded")
-        
         try:
-            # Generate embedding
-            embedding = self.model.encode([text], convert_to_numpy=True)
-            
-            # Return as list for compatibility
-            return embedding[0].tolist()
-            
+            # Single-item batch through the shared encode path
+            return self._encode([text])[0]
+
         except Exception as e:
             raise ValueError(f"Error generating query embedding: {str(e)}")
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for several queries with one model call.
+
+        Callers that have multiple queries in flight (e.g. warming caches or
+        batched search) should prefer this over repeated embed_query calls
+        so the model sees one large batch instead of many single items.
+
+        Args:
+            texts: Query texts to embed
+
+        Returns:
+            float32 array of shape (len(texts), dimension)
+        """
+        try:
+            return self._encode(texts)
+
+        except Exception as e:
+            raise ValueError(f"Error generating query embeddings: {str(e)}")
     
     def get_dimension(self) -> int:
         """Get the dimension of the embeddings."""
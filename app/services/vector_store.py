@@ -2,9 +2,13 @@
 Vector store service using FAISS for document embeddings and similarity search.
 """
 
+import atexit
+import hashlib
 import os
 import pickle
+import threading
 import numpy as np
+from functools import lru_cache
 from typing import List, Dict, Any, Tuple
 import faiss
 from langchain_openai import AzureOpenAIEmbeddings
@@ -12,6 +16,74 @@ from langchain_openai import AzureOpenAIEmbeddings
 from app.core.config import settings
 from app.services.local_embeddings import LocalEmbeddings
 
+# HNSW parameters: 32 neighbors per node and a generous construction beam
+# give near-exact recall on sentence-embedding corpora; efSearch trades
+# query time for recall at search time
+HNSW_NEIGHBORS = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Product quantization: 8 dimensions per sub-quantizer, 8 bits per code.
+# A 384-d float32 vector (1536 bytes) compresses to 48 bytes — memory-
+# bandwidth-bound search touches 32x fewer bytes per vector.
+PQ_DIMS_PER_CODE = 8
+PQ_BITS = 8
+
+# Vectors required before a PQ codebook is trained. FAISS k-means throws
+# on fewer than 256 points per sub-quantizer, and codebooks calibrated on
+# a few hundred vectors quantize poorly, so a PQ-configured store runs on
+# an exact flat index until this many vectors exist and then cuts over,
+# training on the whole corpus accumulated so far. Corpora that never get
+# this big simply stay flat — the better index at that scale anyway.
+PQ_TRAIN_MIN_VECTORS = 10000
+
+# Distinct query embeddings kept in the per-store LRU cache
+QUERY_EMBED_CACHE_SIZE = 1024
+
+# Preview length bounds: cut at PREVIEW_MAX_CHARS, but take an extra
+# sentence when the first two fall short of PREVIEW_MIN_CHARS
+PREVIEW_MAX_CHARS = 200
+PREVIEW_MIN_CHARS = 150
+
+# How long to coalesce index writes before flushing to disk. Persisting is
+# O(total chunks), so rewriting per add dominates bulk-ingest latency.
+SAVE_DEBOUNCE_SECONDS = 2.0
+
+# Chunks embedded and added to the index per ingest step. Streaming in
+# bounded batches caps peak memory at one batch of embeddings instead of
+# the whole upload, while staying several encoder batches wide so the
+# model still sees full batches.
+INGEST_BATCH_CHUNKS = 512
+
+
+def _chunk_hash(text: str) -> bytes:
+    """16-byte digest of a chunk, used to spot duplicate texts at ingest.
+
+    blake2b is markedly faster than sha256 and a 128-bit digest makes
+    accidental collisions a non-issue at this corpus scale.
+    """
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+def _truncate_preview(text: str) -> str:
+    """Build a sentence-aware preview of a chunk.
+
+    Computed once per chunk at ingest and cached in its metadata, so chat
+    responses read a precomputed string instead of re-splitting the chunk
+    text on every request.
+    """
+    text = text.strip()
+    if len(text) <= PREVIEW_MAX_CHARS:
+        return text
+
+    sentences = text.split('. ')
+    truncated = '. '.join(sentences[:2])
+    if len(truncated) < PREVIEW_MIN_CHARS and len(sentences) > 2:
+        truncated = '. '.join(sentences[:3])
+    if len(truncated) < len(text):
+        truncated += '...'
+    return truncated
+
 
 class VectorStore:
     """FAISS-based vector store for document embeddings."""
@@ -68,21 +140,62 @@ class VectorStore:
         self.metadata_file = os.path.join(settings.vector_store_dir, "metadata.pkl")
         
         self.index = None
-        self.metadata = []
-        
+        # Chunk metadata keyed by vector id; ids are stable for the life of
+        # a chunk, so deletions never renumber anything
+        self.metadata = {}
+        self._next_id = 0
+
+        # Repeat questions skip the encoder forward pass — the second-
+        # largest cost after the LLM call — via this per-store LRU cache
+        # of normalized query -> ready-to-search vector
+        self._embed_query_cached = lru_cache(maxsize=QUERY_EMBED_CACHE_SIZE)(
+            self._embed_query_uncached
+        )
+
+        # Guards the index/metadata pair and the debounced-save timer. The
+        # save runs on a timer thread, so mutations and serialization must
+        # exclude each other or a save in flight can write a corrupt
+        # index/metadata pair; re-entrant because deletion paths save
+        # eagerly while already holding the lock.
+        self._state_lock = threading.RLock()
+        self._save_timer = None
+        # True only after an unpersisted mutation; saves (including the
+        # atexit flush) are no-ops while clean, so a process that never
+        # changed anything never rewrites the on-disk store
+        self._dirty = False
+
         self._load_or_create_index()
+
+        # Make sure a pending debounced save isn't lost on shutdown
+        atexit.register(self.flush)
     
     def _load_or_create_index(self) -> None:
         """Load existing index or create a new one."""
         if os.path.exists(self.index_file) and os.path.exists(self.metadata_file):
             try:
-                # Load FAISS index
-                self.index = faiss.read_index(self.index_file)
+                # Load FAISS index. With faiss_mmap set, the vectors are
+                # memory-mapped read-only instead of copied into RAM:
+                # startup is near-instant and the pages are shared across
+                # worker processes, at the cost of the index rejecting
+                # further adds (serve-only deployments).
+                if settings.faiss_mmap:
+                    self.index = faiss.read_index(
+                        self.index_file,
+                        faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                    )
+                else:
+                    self.index = faiss.read_index(self.index_file)
                 
                 # Load metadata
                 with open(self.metadata_file, 'rb') as f:
                     self.metadata = pickle.load(f)
-                
+
+                if isinstance(self.metadata, list):
+                    # Store written before ids were explicit
+                    self._migrate_legacy_store()
+                else:
+                    self._next_id = max(self.metadata, default=-1) + 1
+
                 print(f"Loaded existing vector store with {len(self.metadata)} documents")
             except Exception as e:
                 print(f"Error loading vector store: {e}")
@@ -90,53 +203,281 @@ class VectorStore:
         else:
             self._create_new_index()
     
+    def _new_index(self) -> faiss.Index:
+        """Build an empty FAISS index of the configured type.
+
+        "flat" keeps exact float32 vectors and scans all of them per query.
+        "sq8" stores int8 scalar-quantized vectors — 4x less memory and
+        faster distance kernels at a negligible recall cost for
+        sentence-transformer embeddings. "pq" product-quantizes to one byte
+        per 8 dimensions (32x compression) for corpora where even sq8 is
+        too large to keep in RAM. "hnsw" builds a graph index with
+        log-time queries instead of a linear scan, the right choice once
+        the store holds more than a few thousand chunks. sq8 trains itself
+        on the first ingest batch (it only needs per-dimension ranges); pq
+        needs a real calibration sample, so the store starts flat and cuts
+        over later — see _maybe_upgrade_to_pq.
+        """
+        if settings.faiss_index_type == "pq":
+            return faiss.IndexPQ(
+                self.dimension, self.dimension // PQ_DIMS_PER_CODE, PQ_BITS,
+                faiss.METRIC_INNER_PRODUCT
+            )
+        if settings.faiss_index_type == "sq8":
+            return faiss.IndexScalarQuantizer(
+                self.dimension, faiss.ScalarQuantizer.QT_8bit,
+                faiss.METRIC_INNER_PRODUCT
+            )
+        if settings.faiss_index_type == "hnsw":
+            index = faiss.IndexHNSWFlat(
+                self.dimension, HNSW_NEIGHBORS, faiss.METRIC_INNER_PRODUCT
+            )
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.hnsw.efSearch = HNSW_EF_SEARCH
+            return index
+        return faiss.IndexFlatIP(self.dimension)
+
     def _create_new_index(self) -> None:
         """Create a new FAISS index."""
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.metadata = []
+        # The IDMap wrapper gives every vector an explicit int64 id, which
+        # makes deletion a remove_ids call instead of a full rebuild. PQ
+        # starts on an exact flat index until a codebook can be trained;
+        # see _maybe_upgrade_to_pq.
+        if settings.faiss_index_type == "pq":
+            self.index = faiss.IndexIDMap(faiss.IndexFlatIP(self.dimension))
+        else:
+            self.index = faiss.IndexIDMap(self._new_index())
+        self.metadata = {}
+        self._next_id = 0
         print("Created new vector store")
+
+    def _pq_cutover_pending(self) -> bool:
+        """Whether the store is a deferred-PQ flat index awaiting training."""
+        if settings.faiss_index_type != "pq":
+            return False
+        try:
+            inner = faiss.downcast_index(self.index.index)
+        except Exception:
+            # Not an IDMap wrapper (e.g. an mmap'd read-only store)
+            return False
+        return not isinstance(inner, faiss.IndexPQ)
+
+    def _maybe_upgrade_to_pq(self) -> None:
+        """Swap the interim flat index for a trained PQ index.
+
+        Runs after each ingest; a no-op until PQ_TRAIN_MIN_VECTORS have
+        accumulated. The interim flat index holds the exact vectors, so the
+        codebook trains on the whole corpus so far — not a single ingest
+        batch — and the vectors move over by reconstruction, with no
+        re-embedding. Checking the live index type (rather than a flag)
+        means a store saved mid-deferral resumes correctly after reload.
+        """
+        if not self._pq_cutover_pending() or self.index.ntotal < PQ_TRAIN_MIN_VECTORS:
+            return
+
+        flat = self.index
+        vectors = flat.index.reconstruct_n(0, flat.index.ntotal)
+        ids = faiss.vector_to_array(flat.id_map)
+
+        pq_index = faiss.IndexIDMap(self._new_index())
+        pq_index.train(vectors)
+        pq_index.add_with_ids(vectors, ids)
+        self.index = pq_index
+        print(f"Trained PQ codebook on {len(ids)} vectors and cut over from flat index")
+
+    def _migrate_legacy_store(self) -> None:
+        """Upgrade a pre-IDMap store (list metadata, bare index) in place.
+
+        The stored vectors are reconstructed straight from the old index —
+        no re-embedding — and re-added under explicit ids matching their
+        old positions.
+        """
+        legacy_metadata = self.metadata
+        legacy_index = self.index
+        self._create_new_index()
+
+        if legacy_metadata and legacy_index.ntotal == len(legacy_metadata):
+            vectors = legacy_index.reconstruct_n(0, legacy_index.ntotal)
+            # Legacy stores were built from unnormalized encode output for
+            # an L2 index; the inner-product index needs unit vectors or
+            # scores become magnitude-skewed dot products
+            faiss.normalize_L2(vectors)
+            ids = np.arange(legacy_index.ntotal, dtype=np.int64)
+            if not self.index.is_trained:
+                self.index.train(vectors)
+            self.index.add_with_ids(vectors, ids)
+            self.metadata = {meta["vector_id"]: meta for meta in legacy_metadata}
+            self._next_id = legacy_index.ntotal
+
+        self._dirty = True
+        self._save_index()
+        print(f"Migrated legacy vector store ({len(self.metadata)} chunks)")
     
+    def _schedule_save(self) -> None:
+        """Persist soon, coalescing bursts of adds into a single write.
+
+        Writing the index is O(total chunks), so saving after every add
+        makes bulk ingest quadratic in disk I/O. Each call restarts a short
+        timer; the actual write happens once things quiet down, off the
+        request thread.
+        """
+        with self._state_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+            self._save_timer = threading.Timer(SAVE_DEBOUNCE_SECONDS, self._save_index)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self) -> None:
+        """Write any pending state to disk immediately."""
+        self._save_index()
+
     def _save_index(self) -> None:
-        """Save the FAISS index and metadata to disk."""
-        try:
-            faiss.write_index(self.index, self.index_file)
-            with open(self.metadata_file, 'wb') as f:
-                pickle.dump(self.metadata, f)
-        except Exception as e:
-            print(f"Error saving vector store: {e}")
+        """Save the FAISS index and metadata to disk.
+
+        Runs under the state lock for the whole write: this may execute on
+        the debounce timer thread, and serializing the index while another
+        thread mutates it can crash or persist a corrupt index/metadata
+        pair.
+        """
+        with self._state_lock:
+            if self._save_timer is not None:
+                self._save_timer.cancel()
+                self._save_timer = None
+            # Nothing mutated since the last write: leave the files alone.
+            # This matters at shutdown — if loading failed and the store
+            # was replaced in memory by a fresh empty one, rewriting
+            # unconditionally would clobber the on-disk data even though
+            # this process never changed anything.
+            if not self._dirty:
+                return
+            try:
+                faiss.write_index(self.index, self.index_file)
+                with open(self.metadata_file, 'wb') as f:
+                    pickle.dump(self.metadata, f)
+                self._dirty = False
+            except Exception as e:
+                print(f"Error saving vector store: {e}")
     
     def add_documents(self, chunks: List[str], document_id: str, filename: str) -> None:
         """Add document chunks to the vector store."""
+        self.add_documents_bulk([(chunks, document_id, filename)])
+
+    def add_documents_bulk(self, items: List[Tuple[List[str], str, str]]) -> None:
+        """Add chunks from several documents, streaming through the index.
+
+        Chunks flow through embed -> normalize -> FAISS add in bounded
+        batches: each batch of embeddings is released before the next is
+        computed, so peak memory is one batch rather than every embedding
+        of the upload. Batches stay wide enough that the encoder still
+        amortizes its per-call dispatch overhead.
+
+        Args:
+            items: (chunks, document_id, filename) tuples, one per document.
+        """
         if not self.embeddings:
             raise ValueError("No embedding service available. Cannot add documents to vector store.")
-        
+
         try:
-            # Generate embeddings for chunks
-            embeddings = self.embeddings.embed_documents(chunks)
-            embeddings_array = np.array(embeddings, dtype=np.float32)
-            
-            # Add to FAISS index
-            self.index.add(embeddings_array)
-            
-            # Store metadata for each chunk
-            for i, chunk in enumerate(chunks):
-                chunk_metadata = {
-                    "document_id": document_id,
-                    "filename": filename,
-                    "chunk_index": i,
-                    "text": chunk,
-                    "vector_id": len(self.metadata)  # Current position in index
-                }
-                self.metadata.append(chunk_metadata)
-            
-            # Save to disk
-            self._save_index()
-            
-            print(f"Added {len(chunks)} chunks from {filename} to vector store")
-            
+            # Flatten to (text, document_id, filename, chunk_index) so the
+            # batching loop doesn't care about document boundaries
+            flat = [
+                (chunk, document_id, filename, i)
+                for chunks, document_id, filename in items
+                for i, chunk in enumerate(chunks)
+            ]
+            if not flat:
+                return
+
+            duplicates = 0
+            for start in range(0, len(flat), INGEST_BATCH_CHUNKS):
+                batch = flat[start:start + INGEST_BATCH_CHUNKS]
+
+                # Embed each distinct text in the batch once — recurring
+                # headers, footers and boilerplate skip the encoder — but
+                # every chunk still gets its own vector and metadata below,
+                # so deleting one document never removes content that
+                # another document also contains.
+                positions = {}
+                texts = []
+                rows = []
+                for chunk, _, _, _ in batch:
+                    pos = positions.setdefault(_chunk_hash(chunk), len(texts))
+                    if pos == len(texts):
+                        texts.append(chunk)
+                    rows.append(pos)
+                duplicates += len(batch) - len(texts)
+
+                # LocalEmbeddings already returns a contiguous float32
+                # array, so this is a no-copy passthrough; Azure
+                # embeddings (lists) still convert.
+                embeddings = self.embeddings.embed_documents(texts)
+                unique_array = np.ascontiguousarray(embeddings, dtype=np.float32)
+                faiss.normalize_L2(unique_array)
+
+                # Fan the unique embeddings back out to one row per chunk
+                if len(texts) == len(batch):
+                    embeddings_array = unique_array
+                else:
+                    embeddings_array = unique_array[rows]
+
+                # Index and metadata updates exclude a save in flight; the
+                # encoder work above deliberately stays outside the lock
+                with self._state_lock:
+                    # Quantized index types need a one-off training pass;
+                    # the first batch of real embeddings is the
+                    # calibration sample
+                    if not self.index.is_trained:
+                        self.index.train(unique_array)
+
+                    # Add to FAISS index under explicit, never-reused ids
+                    ids = np.arange(
+                        self._next_id, self._next_id + len(batch), dtype=np.int64
+                    )
+                    self.index.add_with_ids(embeddings_array, ids)
+
+                    for vector_id, (chunk, document_id, filename, chunk_index) in zip(ids, batch):
+                        vector_id = int(vector_id)
+                        self.metadata[vector_id] = {
+                            "document_id": document_id,
+                            "filename": filename,
+                            "chunk_index": chunk_index,
+                            "text": chunk,
+                            "preview": _truncate_preview(chunk),
+                            "vector_id": vector_id
+                        }
+                    self._next_id += len(batch)
+                    self._dirty = True
+
+            if duplicates:
+                print(f"Reused embeddings for {duplicates} duplicate chunks")
+
+            for chunks, _, filename in items:
+                print(f"Added {len(chunks)} chunks from {filename} to vector store")
+
+            # Deferred PQ cuts over once the corpus can support a codebook
+            with self._state_lock:
+                self._maybe_upgrade_to_pq()
+
+            # Persist off the request path; deletions still save eagerly
+            self._schedule_save()
+
         except Exception as e:
             raise ValueError(f"Error adding documents to vector store: {str(e)}")
     
+    def _embed_query_uncached(self, query: str) -> np.ndarray:
+        """Embed one query into a normalized, search-ready (1, dim) vector.
+
+        Wrapped by an lru_cache in __init__; the result is marked read-only
+        since cache hits hand out the same array.
+        """
+        query_vector = np.ascontiguousarray(
+            self.embeddings.embed_query(query), dtype=np.float32
+        ).reshape(1, -1)
+        faiss.normalize_L2(query_vector)
+        query_vector.setflags(write=False)
+        return query_vector
+
     def similarity_search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         """Perform similarity search and return relevant chunks."""
         if not self.embeddings:
@@ -147,76 +488,148 @@ class VectorStore:
             return []
         
         try:
-            # Generate embedding for query
-            query_embedding = self.embeddings.embed_query(query)
-            query_vector = np.array([query_embedding], dtype=np.float32)
-            
+            # Embed the query (cached on the normalized text, so repeats
+            # skip the forward pass entirely)
+            query_vector = self._embed_query_cached(query.strip().lower())
+
             # Search in FAISS index
             distances, indices = self.index.search(query_vector, min(k, self.index.ntotal))
-            
-            # Retrieve metadata for found chunks
-            results = []
-            for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-                if idx < len(self.metadata):
-                    result = self.metadata[idx].copy()
-                    result["similarity_score"] = float(distance)
-                    result["rank"] = i + 1
-                    results.append(result)
-            
-            return results
-            
+
+            return self._collect_results(distances[0], indices[0])
+
         except Exception as e:
             print(f"Error during similarity search: {e}")
             return []
+
+    def similarity_search_batch(self, queries: List[str], k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Perform similarity search for several queries in one shot.
+
+        All queries are embedded in a single encoder forward pass and FAISS
+        searches the whole batch with one index.search call, which is
+        near-constant-time for small batches — far cheaper than looping
+        similarity_search per query.
+        """
+        if not queries:
+            return []
+
+        if not self.embeddings:
+            print("⚠️  No embedding service available. Cannot perform similarity search.")
+            return [[] for _ in queries]
+
+        if self.index.ntotal == 0:
+            return [[] for _ in queries]
+
+        try:
+            # One batched embed call; fall back to embed_documents for
+            # embedding backends without a dedicated query-batch API
+            if hasattr(self.embeddings, "embed_queries"):
+                embeddings = self.embeddings.embed_queries(queries)
+            else:
+                embeddings = self.embeddings.embed_documents(queries)
+            query_vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+            faiss.normalize_L2(query_vectors)
+
+            # One FAISS call for the whole batch
+            distances, indices = self.index.search(query_vectors, min(k, self.index.ntotal))
+
+            return [
+                self._collect_results(distances[i], indices[i])
+                for i in range(len(queries))
+            ]
+
+        except Exception as e:
+            print(f"Error during batch similarity search: {e}")
+            return [[] for _ in queries]
+
+    def _collect_results(self, distances, indices) -> List[Dict[str, Any]]:
+        """Map one query's FAISS hits back to chunk metadata.
+
+        similarity_score is the inner product of unit vectors, i.e. cosine
+        similarity: higher is better, and FAISS already returns hits in
+        descending order of it.
+        """
+        results = []
+        for i, (distance, idx) in enumerate(zip(distances, indices)):
+            meta = self.metadata.get(int(idx))
+            if meta is not None:
+                result = meta.copy()
+                result["similarity_score"] = float(distance)
+                result["rank"] = i + 1
+                results.append(result)
+
+        return results
     
     def remove_document(self, document_id: str) -> bool:
-        """Remove all chunks of a document from the vector store."""
+        """Remove all chunks of a document from the vector store.
+
+        Deletion is a FAISS remove_ids call on the IDMap wrapper — no
+        re-embedding and no index rebuild. Remaining ids are untouched, so
+        metadata stays valid as-is.
+        """
         try:
-            # Find indices of chunks belonging to the document
-            indices_to_remove = []
-            for i, metadata in enumerate(self.metadata):
-                if metadata["document_id"] == document_id:
-                    indices_to_remove.append(i)
-            
-            if not indices_to_remove:
-                return False
-            
-            # Remove from metadata (in reverse order to maintain indices)
-            for idx in reversed(indices_to_remove):
-                del self.metadata[idx]
-            
-            # Rebuild the FAISS index (FAISS doesn't support efficient deletion)
-            if self.metadata:
-                # Get all remaining embeddings
-                remaining_texts = [meta["text"] for meta in self.metadata]
-                embeddings = self.embeddings.embed_documents(remaining_texts)
-                embeddings_array = np.array(embeddings, dtype=np.float32)
-                
-                # Create new index
-                self.index = faiss.IndexFlatL2(self.dimension)
-                self.index.add(embeddings_array)
-                
-                # Update vector_ids in metadata
-                for i, meta in enumerate(self.metadata):
-                    meta["vector_id"] = i
-            else:
-                # Create empty index if no documents remain
-                self.index = faiss.IndexFlatL2(self.dimension)
-            
-            # Save updated index
-            self._save_index()
-            
+            with self._state_lock:
+                ids_to_remove = [
+                    vector_id for vector_id, meta in self.metadata.items()
+                    if meta["document_id"] == document_id
+                ]
+
+                if not ids_to_remove:
+                    return False
+
+                self._dirty = True
+                id_array = np.asarray(ids_to_remove, dtype=np.int64)
+                try:
+                    self.index.remove_ids(id_array)
+                except RuntimeError:
+                    # Graph indexes (hnsw) don't implement remove_ids; fall
+                    # back to rebuilding the index from the surviving chunks
+                    for vector_id in ids_to_remove:
+                        del self.metadata[vector_id]
+                    self._rebuild_index_from_metadata()
+                    self._save_index()
+                    print(f"Removed document {document_id} from vector store (rebuild)")
+                    return True
+
+                for vector_id in ids_to_remove:
+                    del self.metadata[vector_id]
+
+                # Save updated index
+                self._save_index()
+
             print(f"Removed document {document_id} from vector store")
             return True
-            
+
         except Exception as e:
             print(f"Error removing document from vector store: {e}")
             return False
+
+    def _rebuild_index_from_metadata(self) -> None:
+        """Re-embed the surviving chunks into a fresh index, keeping ids."""
+        surviving = list(self.metadata.values())
+        next_id = self._next_id
+        self._create_new_index()
+        self._next_id = next_id
+
+        if not surviving:
+            return
+
+        embeddings = self.embeddings.embed_documents(
+            [meta["text"] for meta in surviving]
+        )
+        embeddings_array = np.ascontiguousarray(embeddings, dtype=np.float32)
+        faiss.normalize_L2(embeddings_array)
+
+        if not self.index.is_trained:
+            self.index.train(embeddings_array)
+
+        ids = np.asarray([meta["vector_id"] for meta in surviving], dtype=np.int64)
+        self.index.add_with_ids(embeddings_array, ids)
+        self.metadata = {meta["vector_id"]: meta for meta in surviving}
     
     def get_stats(self) -> Dict[str, Any]:
         """Get vector store statistics."""
         document_ids = set()
-        for meta in self.metadata:
+        for meta in self.metadata.values():
             document_ids.add(meta["document_id"])
         
         return {
@@ -228,7 +641,8 @@ class VectorStore:
     
     def clear_all(self) -> None:
         """Clear all data from the vector store."""
-        self.index = faiss.IndexFlatL2(self.dimension)
-        self.metadata = []
-        self._save_index()
+        with self._state_lock:
+            self._create_new_index()
+            self._dirty = True
+            self._save_index()
         print("Cleared all data from vector store") 
\ No newline at end of file
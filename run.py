@@ -4,19 +4,43 @@ Startup script for the AI Document Chat Agent.
 """
 
 import uvicorn
-from app.main import app
 from app.core.config import settings
 
+try:
+    # uvloop's event loop is several times faster than asyncio's default
+    # at socket and callback handling; fall back where it isn't installed
+    # (e.g. Windows)
+    import uvloop  # noqa: F401
+    LOOP = "uvloop"
+except ImportError:
+    LOOP = "auto"
+
+
+def _worker_count() -> int:
+    """Pick the uvicorn worker count.
+
+    Defaults to the single worker the in-process state model requires;
+    multi-worker is opt-in via the WORKERS setting (see config.py for the
+    caveats). Debug mode always keeps one worker so --reload works.
+    """
+    if settings.debug:
+        return 1
+    return max(1, settings.workers)
+
+
 if __name__ == "__main__":
     print("🚀 Starting AI Document Chat Agent...")
     print(f"📍 Server will be available at: http://{settings.host}:{settings.port}")
     print(f"📚 API Documentation: http://{settings.host}:{settings.port}/api/docs")
     print("🔧 Make sure to configure your .env file with Azure OpenAI credentials")
-    
+
     uvicorn.run(
         "app.main:app",
         host=settings.host,
         port=settings.port,
         reload=settings.debug,
+        workers=_worker_count(),
+        loop=LOOP,
+        http="httptools",
         log_level="info"
-    ) 
\ No newline at end of file
+    )